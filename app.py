@@ -1,384 +1,577 @@
-import streamlit as st
-import pandas as pd
-import os, time
-from engine import ParasiteIdentifier, SENTINEL
-
-# ------------------------- CONFIG -------------------------
-st.set_page_config(page_title="🦠 ParAI-D: Intelligent Parasite Diagnostic Assistant", layout="wide")
-DATA_PATH = "ParasiteMasterData.xlsx"
-FIXED_MAX_SCORE = 113  # model-wide baseline
-
-GROUP_NAMES = {
-    1: "Intestinal Protozoa",
-    2: "Opportunistic Protozoa",
-    3: "Blood & Tissue Protozoa",
-    4: "Intestinal Nematodes",
-    5: "Tissue / Migratory Nematodes",
-    6: "Filarial Nematodes",
-    7: "Trematodes (Flukes)",
-    8: "Cestodes (Tapeworms)",
-    9: "Myiasis / Arthropod Parasites",
-    10: "Rare / Zoonotic Special Parasites",
-    -1: "Unassigned / Unknown Group",
-}
-
-# ------------------------- RESET FIRST -------------------------
-if st.session_state.get("__RESET_ALL__", False):
-    for k in list(st.session_state.keys()):
-        if k not in ["_engine", "_df", "_mtime", "__RESET_ALL__"]:
-            del st.session_state[k]
-    st.session_state["__RESET_ALL__"] = False
-    st.rerun()
-
-# ------------------------- UTILS -------------------------
-def fmt_time(ts):
-    try:
-        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
-    except Exception:
-        return "Unknown"
-
-def split_vals(v):
-    return [s.strip().lower() for s in str(v).split(";") if s and s.strip()]
-
-def get_unique_values(df, column, prepend_choose=False, extra=None):
-    vals = []
-    if column in df.columns:
-        for x in df[column].dropna().unique():
-            for part in str(x).split(";"):
-                part = part.strip()
-                if part:
-                    vals.append(part)
-    vals = sorted(set(vals))
-    if extra:
-        for e in extra:
-            if e not in vals:
-                vals.append(e)
-    if prepend_choose:
-        vals = ["Choose…"] + vals  # maps to SENTINEL later
-    return vals
-
-def pct_to_color(pct):
-    pct = max(0.0, min(100.0, pct)) / 100.0
-    r = int(255 * (1 - pct))
-    g = int(150 + 105 * pct)
-    b = int(60 * (1 - pct))
-    return f"#{r:02x}{g:02x}{b:02x}"
-
-def pill(text, color):
-    return f"<span style='display:inline-block;padding:4px 10px;border-radius:999px;background:{color};color:white;font-weight:600;font-size:12px;'>{text}</span>"
-
-def progress_bar_html(percent, color):
-    return f"<div style='background:#ddd;height:6px;border-radius:999px;overflow:hidden;margin-top:6px;'><div style='width:{percent:.1f}%;background:{color};height:100%;'></div></div>"
-
-def valid_field(val):
-    if not val:
-        return False
-    if isinstance(val, list):
-        vals = [str(x).lower() for x in val if str(x).strip()]
-        return any(x not in ("unknown", "choose…", "choose...", SENTINEL, "") for x in vals)
-    v = str(val).lower()
-    return v not in ("unknown", "choose…", "choose...", SENTINEL, "")
-
-# ------------------------- REASONING -------------------------
-KEY_FIELDS_FOR_DIFF = [
-    "Blood Film Result", "Cysts on Imaging", "Eosinophilia",
-    "Vector Exposure", "Anatomy Involvement", "Countries Visited", "Symptoms"
-]
-FIELD_TO_NEXT_TEST = {
-    "Blood Film Result": "Blood film (thick/thin smear) or PCR",
-    "Stool Cysts or Ova": "Stool O&P (concentration, trichrome); antigen or PCR",
-    "Cysts on Imaging": "Targeted ultrasound/CT/MRI",
-    "Eosinophilia": "CBC with differential; consider total IgE",
-    "Neurological Involvement": "Neurological exam ± MRI/CT; CSF if indicated",
-    "Vector Exposure": "Structured exposure history (ticks, insects, fish/meat/produce/soil)",
-    "Anatomy Involvement": "Focused exam or imaging of the organ system",
-    "Symptoms": "Structured symptom review (GI pattern, RUQ pain, skin lesions)",
-    "Liver Function Tests": "LFT panel",
-    "Fever": "Fever charting; malaria RDT when appropriate",
-}
-
-def summarize_reasoning(top_row, user_input, competitors_df):
-    def ui_has(field):
-        v = user_input.get(field, [])
-        return valid_field(v)
-
-    def matches(field):
-        ds = split_vals(top_row.get(field, "") if field in top_row else top_row.get("ref_row", {}).get(field, ""))
-        ui_vals = user_input.get(field, [])
-        ui_vals = [x.lower() for x in ui_vals] if isinstance(ui_vals, list) else [str(ui_vals).lower()]
-        ui_vals = [x for x in ui_vals if x not in ("unknown", "choose…", "choose...", SENTINEL, "")]
-        return any(u in ds for u in ui_vals) if ui_vals else False
-
-    positives = []
-    if ui_has("Vector Exposure") and matches("Vector Exposure"):
-        positives.append("vector exposure aligns")
-    if ui_has("Anatomy Involvement") and matches("Anatomy Involvement"):
-        positives.append("organ involvement matches")
-    if ui_has("Countries Visited") and matches("Countries Visited"):
-        positives.append("geography is consistent")
-    if ui_has("Eosinophilia") and matches("Eosinophilia"):
-        positives.append("eosinophilia pattern is supportive")
-    if ui_has("Blood Film Result") and matches("Blood Film Result"):
-        positives.append("blood film findings are supportive")
-    if ui_has("Cysts on Imaging") and matches("Cysts on Imaging"):
-        positives.append("imaging pattern is consistent")
-
-    if positives:
-        lead = ", ".join(positives[:-1]) + ("," if len(positives) > 1 else "")
-        tail = f" and {positives[-1]}" if len(positives) > 1 else positives[0]
-        reasoning = f"The {lead}{tail} for **{top_row['Parasite']}**."
-    else:
-        reasoning = f"The overall pattern is compatible with **{top_row['Parasite']}**, though direct matches are limited."
-
-    comparisons = []
-    if isinstance(competitors_df, pd.DataFrame) and not competitors_df.empty:
-        for _, comp in competitors_df.iterrows():
-            diffs = []
-            for f in KEY_FIELDS_FOR_DIFF:
-                a = str(top_row.get(f, top_row.get('ref_row', {}).get(f, ""))).lower()
-                b = str(comp.get(f, comp.get('ref_row', {}).get(f, ""))).lower()
-                if a != b:
-                    diffs.append(f)
-            if diffs:
-                comparisons.append(
-                    f"Compared with **{comp['Parasite']}**, key differentiators are: " +
-                    ", ".join(diffs[:3]) + ("" if len(diffs) <= 3 else ", …") + "."
-                )
-
-    next_tests = []
-    for f, t in FIELD_TO_NEXT_TEST.items():
-        v = user_input.get(f, [])
-        if not valid_field(v):
-            next_tests.append(t)
-    next_tests = sorted(set(next_tests))
-
-    return reasoning, comparisons, next_tests
-
-# ------------------------- LOAD ENGINE + DF (live reload) -------------------------
-@st.cache_resource
-def _init_engine_df(path: str):
-    df = pd.read_excel(path)
-    df.columns = [c.strip() for c in df.columns]
-    # ensure numeric group and fallback
-    df["Group"] = pd.to_numeric(df.get("Group"), errors="coerce")
-    df["Group_filled"] = df["Group"].fillna(-1)
-    eng = ParasiteIdentifier(df)
-    return eng, df
-
-def reload_if_changed():
-    mtime = os.path.getmtime(DATA_PATH)
-    if "_mtime" not in st.session_state or mtime != st.session_state["_mtime"]:
-        eng, df = _init_engine_df(DATA_PATH)
-        st.session_state["_engine"] = eng
-        st.session_state["_df"] = df
-        st.session_state["_mtime"] = mtime
-        st.toast("🔄 Database reloaded!", icon="✅")
-    return st.session_state["_engine"], st.session_state["_df"], st.session_state["_mtime"]
-
-if "_engine" not in st.session_state:
-    eng0, df0 = _init_engine_df(DATA_PATH)
-    st.session_state["_engine"] = eng0
-    st.session_state["_df"] = df0
-    st.session_state["_mtime"] = os.path.getmtime(DATA_PATH)
-
-eng, df, mtime = reload_if_changed()
-
-# ------------------------- SIDEBAR -------------------------
-with st.sidebar:
-    st.markdown("### 📦 Database Info")
-    st.caption(f"**ParasiteMasterData.xlsx** last updated: `{fmt_time(mtime)}`")
-    st.divider()
-
-    st.header("⚙️ Input Parameters")
-
-    # Environmental
-    with st.expander("🌍 Environmental Data", expanded=False):
-        countries = st.multiselect("Countries Visited", get_unique_values(df, "Countries Visited"))
-        anatomy   = st.multiselect("Anatomy Involvement", get_unique_values(df, "Anatomy Involvement"))
-        vector    = st.multiselect("Vector Exposure", get_unique_values(df, "Vector Exposure"))
-
-    # Symptoms
-    with st.expander("🧬 Symptomatic Data", expanded=False):
-        symptoms  = st.multiselect("Symptoms", get_unique_values(df, "Symptoms"))
-        duration  = st.multiselect("Duration of Illness", get_unique_values(df, "Duration of Illness"))
-
-    # Lab
-    with st.expander("🧫 Laboratory Data", expanded=False):
-        blood_film    = st.selectbox("Blood Film Result", get_unique_values(df, "Blood Film Result", prepend_choose=True))
-        lft           = st.selectbox("Liver Function Tests", get_unique_values(df, "Liver Function Tests", prepend_choose=True))
-        cysts_imaging = st.selectbox("Cysts on Imaging", get_unique_values(df, "Cysts on Imaging", prepend_choose=True, extra=["None"]))
-        neuro         = st.selectbox("Neurological Involvement", get_unique_values(df, "Neurological Involvement", prepend_choose=True))
-        eos           = st.selectbox("Eosinophilia", get_unique_values(df, "Eosinophilia", prepend_choose=True))
-        fever         = st.selectbox("Fever", get_unique_values(df, "Fever", prepend_choose=True))
-        diarrhea      = st.selectbox("Diarrhea", get_unique_values(df, "Diarrhea", prepend_choose=True))
-        bloody        = st.selectbox("Bloody Diarrhea", get_unique_values(df, "Bloody Diarrhea", prepend_choose=True))
-        stool         = st.selectbox("Stool Cysts or Ova", get_unique_values(df, "Stool Cysts or Ova", prepend_choose=True))
-        anemia        = st.selectbox("Anemia", get_unique_values(df, "Anemia", prepend_choose=True))
-        ige           = st.selectbox("High IgE Level", get_unique_values(df, "High IgE Level", prepend_choose=True))
-
-    # Other
-    with st.expander("🧩 Other", expanded=False):
-        animal = st.multiselect("Animal Contact Type", get_unique_values(df, "Animal Contact Type"))
-        immune = st.selectbox("Immune Status", get_unique_values(df, "Immune Status", prepend_choose=True))
-
-    st.markdown("---")
-    colA, colB = st.columns(2)
-    with colA:
-        go = st.button("🔍 Analyze", use_container_width=True)
-    with colB:
-        if st.button("♻️ Reset all", use_container_width=True):
-            st.session_state["__RESET_ALL__"] = True
-            st.rerun()
-
-# ------------------------- MAIN -------------------------
-st.title("🦠 ParAI-D")
-st.caption("AI-assisted differential diagnosis for parasitic infections.")
-st.divider()
-
-if go:
-    # Map single-selects "Choose…" to SENTINEL
-    def as_single_list(v):
-        if str(v).lower().startswith("choose"):
-            return [SENTINEL]
-        return [v]
-
-    ui = {
-        "Countries Visited": countries,
-        "Anatomy Involvement": anatomy,
-        "Vector Exposure": vector,
-        "Symptoms": symptoms,
-        "Duration of Illness": duration,
-        "Animal Contact Type": animal,
-        "Blood Film Result": as_single_list(blood_film),
-        "Immune Status": as_single_list(immune),
-        "Liver Function Tests": as_single_list(lft),
-        "Neurological Involvement": as_single_list(neuro),
-        "Eosinophilia": as_single_list(eos),
-        "Fever": as_single_list(fever),
-        "Diarrhea": as_single_list(diarrhea),
-        "Bloody Diarrhea": as_single_list(bloody),
-        "Stool Cysts or Ova": as_single_list(stool),
-        "Anemia": as_single_list(anemia),
-        "High IgE Level": as_single_list(ige),
-        "Cysts on Imaging": as_single_list(cysts_imaging),
-    }
-
-    results = eng.score_entry(ui)
-
-    # Ensure Group exists; engine already includes it, but guard just in case
-    if "Group" not in results.columns:
-        if "Group" in df.columns:
-            results = results.merge(df[["Parasite", "Group"]], on="Parasite", how="left")
-        else:
-            results["Group"] = -1
-
-    results["Group_filled"] = pd.to_numeric(results["Group"], errors="coerce").fillna(-1)
-
-    # Confidence metrics
-    results["Total Confidence (%)"] = (results["Score"] / FIXED_MAX_SCORE) * 100
-    results["User Confidence (%)"] = results.apply(lambda r: eng.compute_user_confidence(ui, r), axis=1)
-
-    st.caption("🟢 **User Confidence** = match quality based only on your entered fields · ⚪ **Total Confidence** = overall fit (normalised to all fields).")
-    st.divider()
-
-    # Build group panels
-    groups = []
-    for g, sub in results.groupby("Group_filled", dropna=False):
-        sub = sub.sort_values("Likelihood (%)", ascending=False)
-        top = sub.iloc[0]
-        groups.append({
-            "Group": int(g),
-            "Name": GROUP_NAMES.get(int(g), f"Group {int(g)}"),
-            "Rows": sub.head(5).copy(),
-            "Likelihood": float(top["Likelihood (%)"]),
-            "UserConf": float(top["User Confidence (%)"]),
-            "TotalConf": float(top["Total Confidence (%)"])
-        })
-
-    groups = sorted(groups, key=lambda x: x["Likelihood"], reverse=True)
-
-    # Render groups + species (with adaptive reasoning)
-    first_group = True
-    for grp in groups:
-        color = pct_to_color(grp["Likelihood"])
-        st.markdown(
-            f"<div style='display:flex;flex-direction:column;gap:4px;margin:8px 0 2px 0;'>"
-            f"<div style='display:flex;align-items:center;gap:12px;'>"
-            f"<div style='font-size:20px;font-weight:700;line-height:1.2;'>{grp['Name']}</div>"
-            f"{pill(f'{grp['Likelihood']:.1f}% likely', color)}</div>"
-            f"{progress_bar_html(grp['Likelihood'], color)}</div>",
-            unsafe_allow_html=True,
-        )
-
-        with st.expander("Expand group details", expanded=first_group):
-            st.markdown(
-                f"**User Confidence (top species):** {grp['UserConf']:.1f}%  |  "
-                f"**Total Confidence (top species):** {grp['TotalConf']:.1f}%"
-            )
-            st.markdown("#### Species in this group")
-
-            rows = grp["Rows"]
-            first_species = True if first_group else False
-
-            for _, row in rows.iterrows():
-                title = f"{row['Parasite']} · Subtype {row.get('Subtype','')}"
-                # Nearby competitors within ±10% likelihood from *this group's* rows
-                nearby = rows[
-                    (rows["Likelihood (%)"] >= row["Likelihood (%)"] - 10.0) &
-                    (rows["Likelihood (%)"] <= row["Likelihood (%)"] + 10.0) &
-                    (rows["Parasite"] != row["Parasite"])
-                ]
-                reasoning, comparisons, next_tests = summarize_reasoning(row, ui, nearby)
-
-                with st.expander(title, expanded=first_species):
-                    st.markdown(pill(f"{row['Likelihood (%)']:.1f}%", pct_to_color(row["Likelihood (%)"])), unsafe_allow_html=True)
-
-                    # Reasoning
-                    st.markdown(f"**Reasoning:** {reasoning}")
-
-                    # Comparisons
-                    if comparisons:
-                        st.markdown("**Comparison to close candidates:**")
-                        for line in comparisons:
-                            st.markdown(f"- {line}")
-                        st.caption("Close competitors considered: " + ", ".join(nearby["Parasite"].tolist()))
-
-                    # Next tests (based on missing inputs)
-                    if next_tests:
-                        st.markdown("**Next tests to differentiate (based on missing inputs):**")
-                        for t in next_tests:
-                            st.markdown(f"- {t}")
-
-                    # Confirmatory tests (split by ';')
-                    key_text = str(row.get("Key Test", "")).strip()
-                    if key_text:
-                        bullets = [b.strip() for b in key_text.split(";") if b.strip()]
-                        if bullets:
-                            st.markdown("**Confirmatory / definitive tests:**")
-                            for b in bullets:
-                                st.markdown(f"- {b}")
-
-                    # Confidence summary
-                    st.markdown(
-                        f"**User Confidence:** {row['User Confidence (%)']:.1f}%  ·  "
-                        f"**Total Confidence:** {row['Total Confidence (%)']:.1f}%"
-                    )
-
-                first_species = False  # only first species auto-expands
-        st.markdown("---")
-        first_group = False
-
-else:
-    st.info("Open the sidebar, fill known fields, and click **Analyze** to generate results.")
-
-# ------------------------- FOOTER -------------------------
-st.markdown(
-    """
-    <hr style="margin-top:28px;margin-bottom:8px"/>
-    <div style="font-size:12px; color:#888; text-align:center; padding-bottom:8px;">
-        <strong>Disclaimer:</strong> ParAI-D is for assistance and training purposes only and is not a substitute for clinical judgement.<br/>
-        Created by Zain.
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+import streamlit as st
+import pandas as pd
+import numpy as np
+import os, time
+from functools import lru_cache
+from engine import ParasiteIdentifier, SENTINEL, INVALID_TOKENS
+
+# ------------------------- CONFIG -------------------------
+st.set_page_config(page_title="🦠 ParAI-D: Intelligent Parasite Diagnostic Assistant", layout="wide")
+DATA_PATH = "ParasiteMasterData.xlsx"
+FIXED_MAX_SCORE = 113  # model-wide baseline
+
+GROUP_NAMES = {
+    1: "Intestinal Protozoa",
+    2: "Opportunistic Protozoa",
+    3: "Blood & Tissue Protozoa",
+    4: "Intestinal Nematodes",
+    5: "Tissue / Migratory Nematodes",
+    6: "Filarial Nematodes",
+    7: "Trematodes (Flukes)",
+    8: "Cestodes (Tapeworms)",
+    9: "Myiasis / Arthropod Parasites",
+    10: "Rare / Zoonotic Special Parasites",
+    -1: "Unassigned / Unknown Group",
+}
+
+# ------------------------- RESET FIRST -------------------------
+if st.session_state.get("__RESET_ALL__", False):
+    for k in list(st.session_state.keys()):
+        if k not in ["_engine", "_df", "_pgroup", "_mtime", "_mtime_checked_at", "__RESET_ALL__"]:
+            del st.session_state[k]
+    st.session_state["__RESET_ALL__"] = False
+    st.rerun()
+
+# ------------------------- UTILS -------------------------
+def fmt_time(ts_ns):
+    try:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts_ns / 1e9))
+    except Exception:
+        return "Unknown"
+
+@lru_cache(maxsize=4096)
+def _split_cached(v: str):
+    return tuple(s.strip().lower() for s in v.split(";") if s and s.strip())
+
+def split_vals(v):
+    # Cells repeat heavily across rows/reruns, so cache the parsed form
+    return list(_split_cached(str(v)))
+
+def get_unique_values(df, column, prepend_choose=False, extra=None):
+    vals = []
+    if column in df.columns:
+        # Tokenize in pandas' C string kernels instead of a Python loop
+        s = df[column].dropna().astype(str).str.split(";").explode().str.strip()
+        vals = [v for v in s.unique() if v]
+    vals = sorted(set(vals))
+    if extra:
+        for e in extra:
+            if e not in vals:
+                vals.append(e)
+    if prepend_choose:
+        vals = ["Choose…"] + vals  # maps to SENTINEL later
+    return vals
+
+# Columns that feed sidebar widgets; their option lists are precomputed in
+# one pass per data version instead of column-by-column on each rerun.
+SIDEBAR_COLUMNS = [
+    "Countries Visited", "Anatomy Involvement", "Vector Exposure",
+    "Symptoms", "Duration of Illness", "Blood Film Result",
+    "Liver Function Tests", "Cysts on Imaging", "Neurological Involvement",
+    "Eosinophilia", "Fever", "Diarrhea", "Bloody Diarrhea",
+    "Stool Cysts or Ova", "Anemia", "High IgE Level",
+    "Animal Contact Type", "Immune Status",
+]
+
+# Declarative sidebar layout: section -> (field, widget kind, prepend Choose…,
+# extra options). Module-level so the labels are built once and the render
+# loop is pure data instead of 17 hand-written widget calls.
+SIDEBAR_SECTIONS = (
+    ("🌍 Environmental Data", (
+        ("Countries Visited", "multi", False, None),
+        ("Anatomy Involvement", "multi", False, None),
+        ("Vector Exposure", "multi", False, None),
+    )),
+    ("🧬 Symptomatic Data", (
+        ("Symptoms", "multi", False, None),
+        ("Duration of Illness", "multi", False, None),
+    )),
+    ("🧫 Laboratory Data", (
+        ("Blood Film Result", "single", True, None),
+        ("Liver Function Tests", "single", True, None),
+        ("Cysts on Imaging", "single", True, ("None",)),
+        ("Neurological Involvement", "single", True, None),
+        ("Eosinophilia", "single", True, None),
+        ("Fever", "single", True, None),
+        ("Diarrhea", "single", True, None),
+        ("Bloody Diarrhea", "single", True, None),
+        ("Stool Cysts or Ova", "single", True, None),
+        ("Anemia", "single", True, None),
+        ("High IgE Level", "single", True, None),
+    )),
+    ("🧩 Other", (
+        ("Animal Contact Type", "multi", False, None),
+        ("Immune Status", "single", True, None),
+    )),
+)
+
+@st.cache_data(show_spinner=False)
+def _all_options(mtime):
+    # mtime keys the cache to the current data version so the semicolon
+    # splitting/sorting runs once per data reload instead of per rerun.
+    df = st.session_state["_df"]
+    return {c: get_unique_values(df, c) for c in SIDEBAR_COLUMNS}
+
+def _column_options(mtime, column, prepend_choose=False, extra=None):
+    vals = list(_all_options(mtime).get(column, []))
+    if extra:
+        for e in extra:
+            if e not in vals:
+                vals.append(e)
+    if prepend_choose:
+        vals = ["Choose…"] + vals  # maps to SENTINEL later
+    return vals
+
+def _pct_to_color_calc(pct):
+    pct = max(0.0, min(100.0, pct)) / 100.0
+    r = int(255 * (1 - pct))
+    g = int(150 + 105 * pct)
+    b = int(60 * (1 - pct))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+# Only 101 whole-percent colors ever render, so the gradient is precomputed
+# once at import; lookups are a clamp plus an index instead of arithmetic
+# and string formatting per call.
+_PCT_COLOR = tuple(_pct_to_color_calc(p) for p in range(101))
+
+def pct_to_color(pct):
+    return _PCT_COLOR[int(max(0.0, min(100.0, pct)))]
+
+def pct_to_color_vec(arr):
+    """Vectorized pct_to_color over an array of percentages -> hex strings."""
+    idx = np.clip(np.asarray(arr, dtype=float), 0.0, 100.0).astype(int)
+    return [_PCT_COLOR[i] for i in idx]
+
+# Static HTML shells built once; per-call work is just the substitution
+_PILL_TMPL = "<span style='display:inline-block;padding:4px 10px;border-radius:999px;background:{c};color:white;font-weight:600;font-size:12px;'>{t}</span>"
+_BAR_TMPL = "<div style='background:#ddd;height:6px;border-radius:999px;overflow:hidden;margin-top:6px;'><div style='width:{p:.1f}%;background:{c};height:100%;'></div></div>"
+
+def pill(text, color):
+    return _PILL_TMPL.format(c=color, t=text)
+
+def progress_bar_html(percent, color):
+    return _BAR_TMPL.format(p=percent, c=color)
+
+def valid_field(val):
+    if not val:
+        return False
+    if isinstance(val, list):
+        return any(str(x).lower() not in INVALID_TOKENS for x in val if str(x).strip())
+    return str(val).lower() not in INVALID_TOKENS
+
+# ------------------------- REASONING -------------------------
+KEY_FIELDS_FOR_DIFF = [
+    "Blood Film Result", "Cysts on Imaging", "Eosinophilia",
+    "Vector Exposure", "Anatomy Involvement", "Countries Visited", "Symptoms"
+]
+# Fields whose row tokens are pre-split into frozensets at load time
+# (as "<field>__set" columns) so reasoning does set lookups, not re-parsing.
+REASONING_SET_FIELDS = [
+    "Vector Exposure", "Anatomy Involvement", "Countries Visited",
+    "Eosinophilia", "Blood Film Result", "Cysts on Imaging",
+]
+# (field, phrase) pairs driving the positive-reasoning sentence; a flat
+# module-level table instead of six inline branches per call.
+MATCH_NOTES = (
+    ("Vector Exposure", "vector exposure aligns"),
+    ("Anatomy Involvement", "organ involvement matches"),
+    ("Countries Visited", "geography is consistent"),
+    ("Eosinophilia", "eosinophilia pattern is supportive"),
+    ("Blood Film Result", "blood film findings are supportive"),
+    ("Cysts on Imaging", "imaging pattern is consistent"),
+)
+FIELD_TO_NEXT_TEST = {
+    "Blood Film Result": "Blood film (thick/thin smear) or PCR",
+    "Stool Cysts or Ova": "Stool O&P (concentration, trichrome); antigen or PCR",
+    "Cysts on Imaging": "Targeted ultrasound/CT/MRI",
+    "Eosinophilia": "CBC with differential; consider total IgE",
+    "Neurological Involvement": "Neurological exam ± MRI/CT; CSF if indicated",
+    "Vector Exposure": "Structured exposure history (ticks, insects, fish/meat/produce/soil)",
+    "Anatomy Involvement": "Focused exam or imaging of the organ system",
+    "Symptoms": "Structured symptom review (GI pattern, RUQ pain, skin lesions)",
+    "Liver Function Tests": "LFT panel",
+    "Fever": "Fever charting; malaria RDT when appropriate",
+}
+
+def user_token_sets(user_input, fields=REASONING_SET_FIELDS):
+    """Lowercased, filtered user tokens per field, built once per analyze
+    instead of re-lowercasing inside every per-row match check."""
+    sets = {}
+    for f in fields:
+        v = user_input.get(f, [])
+        vals = v if isinstance(v, list) else [v]
+        sets[f] = frozenset(
+            x for x in (str(t).lower() for t in vals)
+            if x not in ("unknown", "choose…", "choose...", SENTINEL, "")
+        )
+    return sets
+
+# Memoized reasoning: user input barely changes between analyze clicks, so
+# (data version, inputs, parasite, competitors) keys a ready-made summary.
+_REASONING_CACHE = {}
+
+def summarize_reasoning_cached(cache_key, top_row, user_input, competitors_df, user_sets=None, next_tests=None):
+    key = (cache_key, top_row.get("Parasite"), tuple(competitors_df["Parasite"]))
+    hit = _REASONING_CACHE.get(key)
+    if hit is None:
+        if len(_REASONING_CACHE) > 4096:
+            _REASONING_CACHE.clear()
+        hit = summarize_reasoning(top_row, user_input, competitors_df, user_sets, next_tests)
+        _REASONING_CACHE[key] = hit
+    return hit
+
+def missing_input_tests(user_input):
+    """Suggested next tests for fields the user left unanswered. Depends only
+    on the inputs, so callers compute it once per analyze, not per species."""
+    return sorted({t for f, t in FIELD_TO_NEXT_TEST.items()
+                   if not valid_field(user_input.get(f, []))})
+
+def summarize_reasoning(top_row, user_input, competitors_df, user_sets=None, next_tests=None):
+    if user_sets is None:
+        user_sets = user_token_sets(user_input)
+    if next_tests is None:
+        next_tests = missing_input_tests(user_input)
+
+    def ui_has(field):
+        return bool(user_sets[field])
+
+    def matches(field):
+        key = field + "__set"
+        ds = top_row.get(key) if key in top_row else top_row.get("ref_row", {}).get(key)
+        if ds is None:
+            ds = frozenset(split_vals(top_row.get(field, "") if field in top_row else top_row.get("ref_row", {}).get(field, "")))
+        return not user_sets[field].isdisjoint(ds)
+
+    positives = [note for f, note in MATCH_NOTES if ui_has(f) and matches(f)]
+
+    if positives:
+        lead = ", ".join(positives[:-1]) + ("," if len(positives) > 1 else "")
+        tail = f" and {positives[-1]}" if len(positives) > 1 else positives[0]
+        reasoning = f"The {lead}{tail} for **{top_row['Parasite']}**."
+    else:
+        reasoning = f"The overall pattern is compatible with **{top_row['Parasite']}**, though direct matches are limited."
+
+    comparisons = []
+    if isinstance(competitors_df, pd.DataFrame) and not competitors_df.empty:
+        top_vals = top_row.get("__diffvals") or top_row.get("ref_row", {}).get("__diffvals")
+        for _, comp in competitors_df.iterrows():
+            comp_vals = comp.get("__diffvals") or comp.get("ref_row", {}).get("__diffvals")
+            if top_vals is not None and comp_vals is not None:
+                diffs = [f for f, a, b in zip(KEY_FIELDS_FOR_DIFF, top_vals, comp_vals) if a != b]
+            else:
+                diffs = []
+                for f in KEY_FIELDS_FOR_DIFF:
+                    a = str(top_row.get(f, top_row.get('ref_row', {}).get(f, ""))).lower()
+                    b = str(comp.get(f, comp.get('ref_row', {}).get(f, ""))).lower()
+                    if a != b:
+                        diffs.append(f)
+            if diffs:
+                comparisons.append(
+                    f"Compared with **{comp['Parasite']}**, key differentiators are: " +
+                    ", ".join(diffs[:3]) + ("" if len(diffs) <= 3 else ", …") + "."
+                )
+
+    return reasoning, comparisons, next_tests
+
+# ------------------------- LOAD ENGINE + DF (live reload) -------------------------
+def _read_master(path: str) -> pd.DataFrame:
+    """Read the master sheet, keeping a Parquet sidecar cache so warm starts
+    skip the slow openpyxl XLSX parse. The sidecar is regenerated whenever
+    the xlsx is newer; caching is best-effort and falls back to the xlsx."""
+    cache = os.path.splitext(path)[0] + ".parquet"
+    try:
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            return pd.read_parquet(cache)
+    except Exception:
+        pass  # unreadable/stale cache: fall through to the xlsx
+    try:
+        # Rust-backed reader, much faster than openpyxl on cold loads
+        df = pd.read_excel(path, engine="calamine")
+    except (ImportError, ValueError):
+        df = pd.read_excel(path)
+    try:
+        df.to_parquet(cache)
+    except Exception:
+        pass  # e.g. pyarrow missing — just means slower cold loads
+    return df
+
+@st.cache_resource(show_spinner=False)
+def _init_engine_df(path: str, mtime: int):
+    # mtime participates in the cache key so a touched xlsx rebuilds the
+    # engine while every ordinary rerun reuses the cached instance.
+    df = _read_master(path)
+    df = df.rename(columns=str.strip)
+    # ensure numeric group and fallback; groups fit comfortably in int8
+    df["Group"] = pd.to_numeric(df.get("Group"), errors="coerce")
+    df["Group_filled"] = df["Group"].fillna(-1).astype("int8")
+    # Low-cardinality string columns as category: equality/groupby/uniques
+    # run on integer codes and the repeated strings are stored once.
+    low_card = [
+        "Duration of Illness", "Blood Film Result", "Liver Function Tests",
+        "Immune Status", "Cysts on Imaging", "Neurological Involvement",
+        "Eosinophilia", "Fever", "Diarrhea", "Bloody Diarrhea",
+        "Stool Cysts or Ova", "Anemia", "High IgE Level",
+    ]
+    for c in low_card:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    # Pre-split reasoning fields into lowercased token sets once per load
+    for f in REASONING_SET_FIELDS:
+        if f in df.columns:
+            df[f + "__set"] = (
+                df[f].fillna("").astype(str).str.lower().str.split(";")
+                .apply(lambda toks: frozenset(t.strip() for t in toks if t.strip()))
+            )
+        else:
+            df[f + "__set"] = [frozenset()] * len(df)
+    # Lowercased per-row diff signature so competitor comparisons don't
+    # re-stringify each field for every pair
+    diff_cols = [
+        df[f].fillna("").astype(str).str.lower() if f in df.columns
+        else pd.Series([""] * len(df))
+        for f in KEY_FIELDS_FOR_DIFF
+    ]
+    df["__diffvals"] = list(zip(*diff_cols))
+    eng = ParasiteIdentifier(df)
+    # Parasite -> group lookup so the analyze path never needs a merge
+    pgroup = dict(zip(df.get("Parasite", []), df["Group_filled"]))
+    return eng, df, pgroup
+
+# Poll the data file at most this often; reruns inside the window skip the
+# stat syscall entirely.
+MTIME_POLL_SECONDS = 3.0
+
+def reload_if_changed():
+    now = time.monotonic()
+    last = st.session_state.get("_mtime_checked_at")
+    if "_mtime" in st.session_state and last is not None and now - last < MTIME_POLL_SECONDS:
+        return st.session_state["_engine"], st.session_state["_df"], st.session_state["_mtime"]
+    st.session_state["_mtime_checked_at"] = now
+    # Integer nanoseconds: exact equality, no float-precision edge cases,
+    # and a stable cache key for everything keyed on the data version.
+    mtime = os.stat(DATA_PATH).st_mtime_ns
+    if "_mtime" not in st.session_state or mtime != st.session_state["_mtime"]:
+        first_load = "_mtime" not in st.session_state
+        eng, df, pgroup = _init_engine_df(DATA_PATH, mtime)
+        st.session_state["_engine"] = eng
+        st.session_state["_df"] = df
+        st.session_state["_pgroup"] = pgroup
+        st.session_state["_mtime"] = mtime
+        if not first_load:
+            st.toast("🔄 Database reloaded!", icon="✅")
+    return st.session_state["_engine"], st.session_state["_df"], st.session_state["_mtime"]
+
+eng, df, mtime = reload_if_changed()
+
+# ------------------------- SIDEBAR -------------------------
+with st.sidebar:
+    st.markdown("### 📦 Database Info")
+    st.caption(f"**ParasiteMasterData.xlsx** last updated: `{fmt_time(mtime)}`")
+    st.divider()
+
+    st.header("⚙️ Input Parameters")
+
+    # Widgets live in a form so tweaking inputs does not rerun the
+    # script; only the Analyze submit does.
+    raw_inputs = {}
+    with st.form("inputs"):
+        for section, entries in SIDEBAR_SECTIONS:
+            with st.expander(section, expanded=False):
+                for field, kind, choose, extra in entries:
+                    opts = _column_options(mtime, field, prepend_choose=choose, extra=extra)
+                    if kind == "multi":
+                        raw_inputs[field] = st.multiselect(field, opts)
+                    else:
+                        raw_inputs[field] = st.selectbox(field, opts)
+
+        go = st.form_submit_button("🔍 Analyze", use_container_width=True)
+
+    if st.button("♻️ Reset all", use_container_width=True):
+        st.session_state["__RESET_ALL__"] = True
+        st.rerun()
+
+# ------------------------- ANALYSIS PIPELINE -------------------------
+@st.cache_data(show_spinner=False, max_entries=64)
+def _analyze(mtime, ui):
+    """Deterministic in (data version, inputs): score, attach confidences
+    and colors, and build the ranked group panels. Cached so flipping a
+    widget back to a previous state reuses the whole pipeline output."""
+    eng = st.session_state["_engine"]
+    results = eng.score_entry(ui)
+    pos = results["__pos"].to_numpy()
+
+    # Ensure Group exists; engine already includes it, but guard just in case
+    if "Group" not in results.columns:
+        results["Group"] = results["Parasite"].map(st.session_state["_pgroup"])
+
+    if "Group_filled" in results.columns:
+        # Coerced once at load and carried through score_entry
+        gfill = results["Group_filled"]
+    else:
+        gfill = pd.to_numeric(results["Group"], errors="coerce").fillna(-1)
+    gints = gfill.astype(int)
+    # One vectorized pass over the catalog instead of a per-row apply;
+    # '__pos' realigns the df-ordered kernel output with the sorted results
+    conf_all = eng.compute_user_confidence_batch(ui)
+    # Reasoning context (token sets, diff signatures) realigned from the
+    # master frame by position; the full ref_row dicts are gone from results
+    reason_cols = {
+        c: eng.df[c].to_numpy()[pos]
+        for c in ["__diffvals"] + [f + "__set" for f in REASONING_SET_FIELDS]
+        if c in eng.df.columns
+    }
+    # One assign() adds every derived column in a single frame rebuild
+    # instead of a separate insertion each
+    results = results.assign(**{
+        "Group_filled": gfill,
+        # Readable group names mapped once for all rows, not per panel
+        "Group Name": gints.map(GROUP_NAMES).fillna("Group " + gints.astype(str)),
+        "Total Confidence (%)": results["Score"].to_numpy() * (100.0 / FIXED_MAX_SCORE),
+        "User Confidence (%)": conf_all[pos],
+        # Colors for every row in one vectorized pass instead of per-render calls
+        "__color": pct_to_color_vec(results["Likelihood (%)"].to_numpy()),
+        **reason_cols,
+    })
+
+    # Build group panels: with only ~10 groups, one sort by (group, -likelihood)
+    # plus np.unique boundary slicing beats paying pandas groupby overhead.
+    ranked = results.sort_values(["Group_filled", "Likelihood (%)"], ascending=[True, False])
+    gvals = ranked["Group_filled"].to_numpy()
+    _, starts = np.unique(gvals, return_index=True)
+    bounds = np.append(starts, len(gvals))
+    groups = []
+    for i in range(len(bounds) - 1):
+        sub = ranked.iloc[bounds[i]:bounds[i + 1]].head(5)
+        top = sub.iloc[0]
+        g = gvals[bounds[i]]
+        groups.append({
+            "Group": int(g),
+            "Name": top["Group Name"],
+            "Rows": sub,  # read-only downstream; no defensive copy needed
+            "Likelihood": float(top["Likelihood (%)"]),
+            "Color": top["__color"],
+            "UserConf": float(top["User Confidence (%)"]),
+            "TotalConf": float(top["Total Confidence (%)"])
+        })
+    groups.sort(key=lambda x: x["Likelihood"], reverse=True)
+    return groups
+
+# ------------------------- MAIN -------------------------
+st.title("🦠 ParAI-D")
+st.caption("AI-assisted differential diagnosis for parasitic infections.")
+st.divider()
+
+if go:
+    # Map single-selects "Choose…" to SENTINEL
+    def as_single_list(v):
+        if str(v).lower().startswith("choose"):
+            return [SENTINEL]
+        return [v]
+
+    ui = {
+        field: as_single_list(raw_inputs[field]) if kind == "single" else raw_inputs[field]
+        for _, entries in SIDEBAR_SECTIONS
+        for field, kind, _choose, _extra in entries
+    }
+
+    groups = _analyze(mtime, ui)
+
+    st.caption("🟢 **User Confidence** = match quality based only on your entered fields · ⚪ **Total Confidence** = overall fit (normalised to all fields).")
+    st.divider()
+
+    # Render groups + species (with adaptive reasoning)
+    user_sets = user_token_sets(ui)
+    # Missing-input test suggestions depend only on the inputs — once per click
+    ui_next_tests = missing_input_tests(ui)
+    ui_sig = (mtime, tuple(sorted((k, tuple(map(str, v))) for k, v in ui.items())))
+    first_group = True
+    for grp in groups:
+        color = grp["Color"]
+        st.markdown(
+            f"<div style='display:flex;flex-direction:column;gap:4px;margin:8px 0 2px 0;'>"
+            f"<div style='display:flex;align-items:center;gap:12px;'>"
+            f"<div style='font-size:20px;font-weight:700;line-height:1.2;'>{grp['Name']}</div>"
+            f"{pill(f'{grp['Likelihood']:.1f}% likely', color)}</div>"
+            f"{progress_bar_html(grp['Likelihood'], color)}</div>",
+            unsafe_allow_html=True,
+        )
+
+        with st.expander("Expand group details", expanded=first_group):
+            st.markdown(
+                f"**User Confidence (top species):** {grp['UserConf']:.1f}%  |  "
+                f"**Total Confidence (top species):** {grp['TotalConf']:.1f}%"
+            )
+            st.markdown("#### Species in this group")
+
+            rows = grp["Rows"]
+
+            # One styled dataframe per group (single component payload)
+            # instead of a markdown call per species for the overview.
+            summary = rows[["Parasite", "Subtype", "Likelihood (%)", "Key Test"]].copy()
+            styler = summary.style.map(
+                lambda v: f"background-color: {pct_to_color(v)}; color: white;",
+                subset=["Likelihood (%)"],
+            ).format({"Likelihood (%)": "{:.1f}"})
+            st.dataframe(styler, use_container_width=True, hide_index=True)
+            first_species = True if first_group else False
+
+            # Nearby competitors within ±10% likelihood, computed for the whole
+            # group in one numpy broadcast instead of three boolean Series per species
+            lk = rows["Likelihood (%)"].to_numpy()
+            pn = rows["Parasite"].to_numpy(dtype=object)
+            near_mask = (np.abs(lk[:, None] - lk[None, :]) <= 10.0) & (pn[:, None] != pn[None, :])
+
+            # Plain dicts beat iterrows' per-row Series construction; records
+            # keep bracket access since column labels contain spaces/()%
+            for i, row in enumerate(rows.to_dict("records")):
+                title = f"{row['Parasite']} · Subtype {row.get('Subtype','')}"
+                nearby = rows.iloc[np.nonzero(near_mask[i])[0]]
+                reasoning, comparisons, next_tests = summarize_reasoning_cached(ui_sig, row, ui, nearby, user_sets, ui_next_tests)
+
+                with st.expander(title, expanded=first_species):
+                    # Collect the whole card and emit one widget call per
+                    # species instead of half a dozen markdown round-trips
+                    parts = [pill(f"{row['Likelihood (%)']:.1f}%", row["__color"])]
+                    parts.append(f"**Reasoning:** {reasoning}")
+
+                    if comparisons:
+                        parts.append("**Comparison to close candidates:**\n" +
+                                     "\n".join(f"- {line}" for line in comparisons))
+                        parts.append("<span style='font-size:12px;color:#888;'>Close competitors considered: " +
+                                     ", ".join(nearby["Parasite"].tolist()) + "</span>")
+
+                    if next_tests:
+                        parts.append("**Next tests to differentiate (based on missing inputs):**\n" +
+                                     "\n".join(f"- {t}" for t in next_tests))
+
+                    # Confirmatory tests (split by ';')
+                    key_text = str(row.get("Key Test", "")).strip()
+                    bullets = [b.strip() for b in key_text.split(";") if b.strip()]
+                    if bullets:
+                        parts.append("**Confirmatory / definitive tests:**\n" +
+                                     "\n".join(f"- {b}" for b in bullets))
+
+                    parts.append(
+                        f"**User Confidence:** {row['User Confidence (%)']:.1f}%  ·  "
+                        f"**Total Confidence:** {row['Total Confidence (%)']:.1f}%"
+                    )
+                    st.markdown("\n\n".join(parts), unsafe_allow_html=True)
+
+                first_species = False  # only first species auto-expands
+        st.markdown("---")
+        first_group = False
+
+else:
+    st.info("Open the sidebar, fill known fields, and click **Analyze** to generate results.")
+
+# ------------------------- FOOTER -------------------------
+st.markdown(
+    """
+    <hr style="margin-top:28px;margin-bottom:8px"/>
+    <div style="font-size:12px; color:#888; text-align:center; padding-bottom:8px;">
+        <strong>Disclaimer:</strong> ParAI-D is for assistance and training purposes only and is not a substitute for clinical judgement.<br/>
+        Created by Zain.
+    </div>
+    """,
+    unsafe_allow_html=True
+)
@@ -1,277 +1,405 @@
-import pandas as pd
-
-# Sentinel used by the app to represent "not chosen" single-selects
-SENTINEL = "__unset__"
-
-class ParasiteIdentifier:
-    """
-    Scoring engine for ParAI-D.
-    Iterates over the master dataframe rows and scores them against user input.
-    """
-
-    def __init__(self, df: pd.DataFrame):
-        # Normalise columns and keep original df for reference
-        self.df = df.copy()
-        self.df.columns = [c.strip() for c in self.df.columns]
-
-        # Normalise known optional Key Test column names
-        if "Key Test" not in self.df.columns:
-            for alt in ["Key test", "Key Tests", "Key notes", "Key Notes"]:
-                if alt in self.df.columns:
-                    self.df["Key Test"] = self.df[alt]
-                    break
-        if "Key Test" not in self.df.columns:
-            self.df["Key Test"] = ""
-
-        # Expose fixed max score (for Total Confidence)
-        # Based on your latest weights: 5 + 5 + 8 + 10 + 5 + 8 + 15 + 2 + 5 + (8 binary *5) + 10 = 113
-        self.max_possible_score = 113
-
-    # --------------- helpers -----------------
-
-    @staticmethod
-    def _split(v):
-        """Split semicolon-separated values to lower-cased list."""
-        return [s.strip().lower() for s in str(v).split(";") if s and s.strip()]
-
-    @staticmethod
-    def _valid_user(val):
-        """True only if user provided a meaningful value (not empty, not Unknown, not sentinel)."""
-        if val is None:
-            return False
-        if isinstance(val, list):
-            vals = [str(x).lower() for x in val if str(x).strip()]
-            return any(x not in ("unknown", "choose…", "choose...", SENTINEL, "") for x in vals)
-        v = str(val).lower()
-        return v not in ("unknown", "choose…", "choose...", SENTINEL, "")
-
-    @staticmethod
-    def _match_any(user_vals, db_vals):
-        """At least one user value matches any db value (lowercased)."""
-        u = [str(x).lower() for x in user_vals if str(x).strip()]
-        d = [str(x).lower() for x in db_vals if str(x).strip()]
-        return any(x in d for x in u)
-
-    # --------------- main scoring -----------------
-
-    def score_entry(self, user_input: dict) -> pd.DataFrame:
-        """
-        Returns a DataFrame with columns:
-        Parasite, Group, Subtype, Score, Likelihood (%), Key Test
-        """
-        out = []
-
-        for _, row in self.df.iterrows():
-            score = 0
-
-            def gl(field):
-                return self._split(row.get(field, ""))
-
-            # Countries (5)
-            if self._valid_user(user_input.get("Countries Visited", [])) and \
-               self._match_any(user_input.get("Countries Visited", []), gl("Countries Visited")):
-                score += 5
-
-            # Anatomy (5)
-            if self._valid_user(user_input.get("Anatomy Involvement", [])) and \
-               self._match_any(user_input.get("Anatomy Involvement", []), gl("Anatomy Involvement")):
-                score += 5
-
-            # Vector (8) + special rule
-            if self._valid_user(user_input.get("Vector Exposure", [])):
-                vec = [x.lower() for x in user_input.get("Vector Exposure", [])]
-                if vec == ["other(including unknown)"]:
-                    score += 8
-                elif self._match_any(vec, gl("Vector Exposure")):
-                    score += 8
-
-            # Symptoms (10) proportional to entries supplied
-            ui_sy = user_input.get("Symptoms", [])
-            if self._valid_user(ui_sy):
-                db_sy = gl("Symptoms")
-                matches = sum(1 for s in ui_sy if str(s).lower() in db_sy)
-                score += (10 / max(1, len(ui_sy))) * matches
-
-            # Duration (5)
-            if self._valid_user(user_input.get("Duration of Illness", [])) and \
-               self._match_any(user_input.get("Duration of Illness", []), gl("Duration of Illness")):
-                score += 5
-
-            # Animal contact (8)
-            if self._valid_user(user_input.get("Animal Contact Type", [])) and \
-               self._match_any(user_input.get("Animal Contact Type", []), gl("Animal Contact Type")):
-                score += 8
-
-            # Blood Film (15): Unknown/Choose ignored; negative mismatch = -10; any positive pattern = +15
-            u_bf = [str(x).lower() for x in user_input.get("Blood Film Result", [])][:1] or [SENTINEL]
-            db_bf = gl("Blood Film Result")
-            if self._valid_user(u_bf):
-                bf = u_bf[0]
-                if bf == "negative":
-                    if all(x != "negative" for x in db_bf):
-                        score -= 10
-                else:
-                    if any(x != "negative" for x in db_bf):
-                        score += 15
-
-            # Immune status (2)
-            if self._valid_user(user_input.get("Immune Status", [])) and \
-               self._match_any(user_input.get("Immune Status", []), gl("Immune Status")):
-                score += 2
-
-            # LFT (5) with 'Variable' rule
-            db_lft = gl("Liver Function Tests")
-            u_lft = [str(x).lower() for x in user_input.get("Liver Function Tests", [])][:1] or [SENTINEL]
-            if self._valid_user(u_lft):
-                if "variable" in db_lft or u_lft[0] in db_lft:
-                    score += 5
-
-            # Binary fields (5 each) with Variable rule
-            for f in [
-                "Neurological Involvement", "Eosinophilia", "Fever",
-                "Diarrhea", "Bloody Diarrhea", "Stool Cysts or Ova",
-                "Anemia", "High IgE Level"
-            ]:
-                u = [str(x).lower() for x in user_input.get(f, [])][:1] or [SENTINEL]
-                db = gl(f)
-                if self._valid_user(u) and ("variable" in db or u[0] in db):
-                    score += 5
-
-            # Cysts on Imaging (10): Unknown/Choose ignored; negative mismatch = -5; any non-negative pattern = +10
-            db_c = gl("Cysts on Imaging")
-            u_c = [str(x).lower() for x in user_input.get("Cysts on Imaging", [])][:1] or [SENTINEL]
-            if self._valid_user(u_c):
-                cval = u_c[0]
-                if cval == "negative":
-                    if all(x != "negative" for x in db_c):
-                        score -= 5
-                else:
-                    if any(x != "negative" for x in db_c):
-                        score += 10
-
-            out.append({
-                "Parasite": row.get("Parasite"),
-                "Group": row.get("Group"),
-                "Subtype": row.get("Subtype"),
-                "Score": score,
-                "Likelihood (%)": round((score / self.max_possible_score) * 100, 2),
-                "Key Test": row.get("Key Test", ""),
-                "ref_row": row.to_dict()
-            })
-
-        res = pd.DataFrame(out).sort_values("Likelihood (%)", ascending=False).reset_index(drop=True)
-        return res
-
-    # --------------- user confidence (public util) -----------------
-
-    def compute_user_confidence(self, ui: dict, row: pd.Series) -> float:
-        """
-        Compute percentage based ONLY on fields the user filled.
-        Mirrors scoring rules but normalises to the max of only entered fields.
-        """
-        def gl(field):
-            # pull from result row if provided, else from the stored ref_row
-            return self._split(row.get(field, "") if field in row else row.get("ref_row", {}).get(field, ""))
-
-        def match(u_list, field):
-            ds = gl(field)
-            u = [str(x).lower() for x in u_list if str(x).strip()]
-            u = [x for x in u if x not in ("unknown", "choose…", "choose...", SENTINEL, "")]
-            return any(x in ds for x in u)
-
-        score = 0.0
-        max_sc = 0.0
-
-        # Countries (5)
-        if self._valid_user(ui.get("Countries Visited", [])):
-            max_sc += 5
-            if match(ui["Countries Visited"], "Countries Visited"):
-                score += 5
-
-        # Anatomy (5)
-        if self._valid_user(ui.get("Anatomy Involvement", [])):
-            max_sc += 5
-            if match(ui["Anatomy Involvement"], "Anatomy Involvement"):
-                score += 5
-
-        # Vector (8)
-        if self._valid_user(ui.get("Vector Exposure", [])):
-            max_sc += 8
-            lower_vec = [x.lower() for x in ui["Vector Exposure"]]
-            if lower_vec == ["other(including unknown)"]:
-                score += 8
-            elif match(ui["Vector Exposure"], "Vector Exposure"):
-                score += 8
-
-        # Symptoms (10)
-        if self._valid_user(ui.get("Symptoms", [])):
-            max_sc += 10
-            db = gl("Symptoms")
-            entered = [s for s in ui["Symptoms"] if str(s).strip()]
-            m = sum(1 for s in entered if str(s).lower() in db)
-            score += (10 / max(1, len(entered))) * m
-
-        # Duration (5)
-        if self._valid_user(ui.get("Duration of Illness", [])):
-            max_sc += 5
-            if match(ui["Duration of Illness"], "Duration of Illness"):
-                score += 5
-
-        # Animal (8)
-        if self._valid_user(ui.get("Animal Contact Type", [])):
-            max_sc += 8
-            if match(ui["Animal Contact Type"], "Animal Contact Type"):
-                score += 8
-
-        # Blood Film (15)
-        bf = [str(x).lower() for x in ui.get("Blood Film Result", [])][:1] or [SENTINEL]
-        db_bf = gl("Blood Film Result")
-        if self._valid_user(bf):
-            max_sc += 15
-            if bf[0] == "negative":
-                if all(x != "negative" for x in db_bf):
-                    score -= 10
-            else:
-                if any(x != "negative" for x in db_bf):
-                    score += 15
-
-        # Immune (2)
-        if self._valid_user(ui.get("Immune Status", [])):
-            max_sc += 2
-            if match(ui["Immune Status"], "Immune Status"):
-                score += 2
-
-        # LFT (5)
-        lft = [str(x).lower() for x in ui.get("Liver Function Tests", [])][:1] or [SENTINEL]
-        if self._valid_user(lft):
-            max_sc += 5
-            db_l = gl("Liver Function Tests")
-            if "variable" in db_l or lft[0] in db_l:
-                score += 5
-
-        # Binary (5 each)
-        for f in [
-            "Neurological Involvement", "Eosinophilia", "Fever",
-            "Diarrhea", "Bloody Diarrhea", "Stool Cysts or Ova",
-            "Anemia", "High IgE Level"
-        ]:
-            v = [str(x).lower() for x in ui.get(f, [])][:1] or [SENTINEL]
-            if self._valid_user(v):
-                max_sc += 5
-                dbv = gl(f)
-                if "variable" in dbv or v[0] in dbv:
-                    score += 5
-
-        # Cysts on Imaging (10)
-        c = [str(x).lower() for x in ui.get("Cysts on Imaging", [])][:1] or [SENTINEL]
-        db_c = gl("Cysts on Imaging")
-        if self._valid_user(c):
-            max_sc += 10
-            if c[0] == "negative":
-                if all(x != "negative" for x in db_c):
-                    score -= 5
-            else:
-                if any(x != "negative" for x in db_c):
-                    score += 10
-
-        return (score / max_sc) * 100 if max_sc > 0 else 0.0
+import re
+
+import numpy as np
+import pandas as pd
+
+# Sentinel used by the app to represent "not chosen" single-selects
+SENTINEL = "__unset__"
+
+# Lowercased values that carry no information; shared with the app's
+# valid_field so both sides agree on what counts as "unanswered".
+INVALID_TOKENS = frozenset({"unknown", "choose…", "choose...", SENTINEL, ""})
+
+# Splits on ';' and eats the surrounding whitespace in the same pass
+_SPLIT_RE = re.compile(r"\s*;\s*")
+
+class ParasiteIdentifier:
+    """
+    Scoring engine for ParAI-D.
+    Iterates over the master dataframe rows and scores them against user input.
+    """
+
+    # Yes/No-style fields scored 5 points each with the 'Variable' rule
+    BINARY_FIELDS = [
+        "Neurological Involvement", "Eosinophilia", "Fever",
+        "Diarrhea", "Bloody Diarrhea", "Stool Cysts or Ova",
+        "Anemia", "High IgE Level",
+    ]
+
+    # Every field score_entry consults on the master rows
+    SCORED_FIELDS = [
+        "Countries Visited", "Anatomy Involvement", "Vector Exposure",
+        "Symptoms", "Duration of Illness", "Animal Contact Type",
+        "Blood Film Result", "Immune Status", "Liver Function Tests",
+        "Cysts on Imaging",
+    ] + BINARY_FIELDS
+
+    def __init__(self, df: pd.DataFrame):
+        # Normalise columns and keep original df for reference
+        self.df = df.copy()
+        self.df.columns = [c.strip() for c in self.df.columns]
+
+        # Normalise known optional Key Test column names
+        if "Key Test" not in self.df.columns:
+            for alt in ["Key test", "Key Tests", "Key notes", "Key Notes"]:
+                if alt in self.df.columns:
+                    self.df["Key Test"] = self.df[alt]
+                    break
+        if "Key Test" not in self.df.columns:
+            self.df["Key Test"] = ""
+
+        # Expose fixed max score (for Total Confidence)
+        # Based on your latest weights: 5 + 5 + 8 + 10 + 5 + 8 + 15 + 2 + 5 + (8 binary *5) + 10 = 113
+        self.max_possible_score = 113
+
+        # Pre-split every scored field into per-row lowercased token sets so
+        # the scoring loop does set lookups instead of re-parsing each cell
+        # on every call.
+        n = len(self.df)
+        self._token_sets = {}
+        for f in self.SCORED_FIELDS:
+            if f in self.df.columns:
+                self._token_sets[f] = [frozenset(self._split(v)) for v in self.df[f]]
+            else:
+                self._token_sets[f] = [frozenset()] * n
+
+        # Per-row flags consumed by the vectorized scoring kernels:
+        # 'variable' wildcards for the Variable-rule fields, and the
+        # negative/positive pattern bits for Blood Film / Cysts on Imaging.
+        self._has_variable = {
+            f: np.fromiter(("variable" in s for s in self._token_sets[f]), dtype=bool, count=n)
+            for f in ["Liver Function Tests"] + self.BINARY_FIELDS
+        }
+        self._has_negative = {}
+        self._has_positive = {}
+        for f in ("Blood Film Result", "Cysts on Imaging"):
+            sets = self._token_sets[f]
+            self._has_negative[f] = np.fromiter(("negative" in s for s in sets), dtype=bool, count=n)
+            self._has_positive[f] = np.fromiter((any(x != "negative" for x in s) for s in sets), dtype=bool, count=n)
+
+    # --------------- helpers -----------------
+
+    @staticmethod
+    def _split(v):
+        """Split semicolon-separated values to lower-cased list."""
+        return [p for p in _SPLIT_RE.split(str(v).strip().lower()) if p]
+
+    @staticmethod
+    def _valid_user(val):
+        """True only if user provided a meaningful value (not empty, not Unknown, not sentinel)."""
+        if val is None:
+            return False
+        if isinstance(val, list):
+            return any(str(x).lower() not in INVALID_TOKENS for x in val if str(x).strip())
+        return str(val).lower() not in INVALID_TOKENS
+
+    @classmethod
+    def normalize_input(cls, ui: dict) -> dict:
+        """Lowercase and listify user input once, so per-row scoring does not
+        re-normalize every field. Safe to call on already-normalized input."""
+        if ui.get("__normalized__"):
+            return ui
+        norm = {"__normalized__": True}
+        for k, v in ui.items():
+            vals = v if isinstance(v, list) else [v]
+            norm[k] = [str(x).lower() for x in vals]
+        return norm
+
+    def _match_mask(self, field, tokens):
+        """Boolean array over catalog rows: any token hits the row's set."""
+        sets = self._token_sets[field]
+        if not tokens:
+            return np.zeros(len(sets), dtype=bool)
+        ts = frozenset(tokens)
+        return np.fromiter((not ts.isdisjoint(s) for s in sets), dtype=bool, count=len(sets))
+
+    def _member_mask(self, field, token):
+        """Boolean array over catalog rows: the token is in the row's set."""
+        sets = self._token_sets[field]
+        return np.fromiter((token in s for s in sets), dtype=bool, count=len(sets))
+
+    # --------------- main scoring -----------------
+
+    def score_entry(self, user_input: dict) -> pd.DataFrame:
+        """
+        Returns a DataFrame with columns:
+        Parasite, Group, Subtype, Score, Likelihood (%), Key Test
+
+        Scores every catalog row at once: each rule contributes a
+        weight × boolean-mask array over the precomputed token sets, so the
+        cost is ~one vectorized op per field instead of a Python pass per row.
+        """
+        ui = self.normalize_input(user_input)
+        n = len(self.df)
+        score = np.zeros(n)
+
+        def clean(vals):
+            # whitespace-empties dropped; placeholder tokens are kept on
+            # purpose — the row loop this replaces matched on them too
+            return [x for x in vals if x.strip()]
+
+        # Simple any-match fields
+        for f, w in (("Countries Visited", 5), ("Anatomy Involvement", 5),
+                     ("Duration of Illness", 5), ("Animal Contact Type", 8),
+                     ("Immune Status", 2)):
+            vals = ui.get(f, [])
+            if self._valid_user(vals):
+                score += w * self._match_mask(f, clean(vals))
+
+        # Vector (8) + special rule
+        vec = ui.get("Vector Exposure", [])
+        if self._valid_user(vec):
+            if vec == ["other(including unknown)"]:
+                score += 8
+            else:
+                score += 8 * self._match_mask("Vector Exposure", clean(vec))
+
+        # Symptoms (10) proportional to entries supplied
+        ui_sy = ui.get("Symptoms", [])
+        if self._valid_user(ui_sy):
+            counts = np.zeros(n)
+            for tok in ui_sy:
+                counts += self._member_mask("Symptoms", tok)
+            score += (10 / max(1, len(ui_sy))) * counts
+
+        # Blood Film (15): Unknown/Choose ignored; negative mismatch = -10; any positive pattern = +15
+        bf = ui.get("Blood Film Result", [])[:1] or [SENTINEL]
+        if self._valid_user(bf):
+            if bf[0] == "negative":
+                score -= 10 * ~self._has_negative["Blood Film Result"]
+            else:
+                score += 15 * self._has_positive["Blood Film Result"]
+
+        # LFT (5) with 'Variable' rule
+        lft = ui.get("Liver Function Tests", [])[:1] or [SENTINEL]
+        if self._valid_user(lft):
+            score += 5 * (self._has_variable["Liver Function Tests"]
+                          | self._member_mask("Liver Function Tests", lft[0]))
+
+        # Binary fields (5 each) with Variable rule
+        for f in self.BINARY_FIELDS:
+            v = ui.get(f, [])[:1] or [SENTINEL]
+            if self._valid_user(v):
+                score += 5 * (self._has_variable[f] | self._member_mask(f, v[0]))
+
+        # Cysts on Imaging (10): Unknown/Choose ignored; negative mismatch = -5; any non-negative pattern = +10
+        c = ui.get("Cysts on Imaging", [])[:1] or [SENTINEL]
+        if self._valid_user(c):
+            if c[0] == "negative":
+                score -= 5 * ~self._has_negative["Cysts on Imaging"]
+            else:
+                score += 10 * self._has_positive["Cysts on Imaging"]
+
+        likelihood = np.round(score * (100.0 / self.max_possible_score), 2)
+        # Rank once with argsort and assemble the frame already ordered,
+        # instead of sorting a freshly-built DataFrame and resetting its index
+        order = np.argsort(-likelihood, kind="stable")
+
+        def col(name):
+            return self.df[name].to_numpy()[order] if name in self.df.columns else None
+
+        data = {
+            "__pos": order,
+            "Parasite": col("Parasite"),
+            "Group": col("Group"),
+            "Subtype": col("Subtype"),
+            "Score": score[order],
+            "Likelihood (%)": likelihood[order],
+            "Key Test": col("Key Test"),
+        }
+        # Carry the loader's already-coerced group ids through when present
+        # so callers don't re-run to_numeric on every scoring call
+        if "Group_filled" in self.df.columns:
+            data["Group_filled"] = col("Group_filled")
+        return pd.DataFrame(data)
+
+    def compute_user_confidence_batch(self, ui: dict) -> np.ndarray:
+        """
+        Vectorized compute_user_confidence for every catalog row at once.
+        Mirrors the per-row rules exactly; returns percentages aligned with
+        self.df row order (see the '__pos' column emitted by score_entry).
+        """
+        ui = self.normalize_input(ui)
+        n = len(self.df)
+        score = np.zeros(n)
+        max_sc = 0.0
+
+        def clean(vals):
+            return [x for x in vals
+                    if x.strip() and x not in ("unknown", "choose…", "choose...", SENTINEL)]
+
+        # Simple any-match fields
+        for f, w in (("Countries Visited", 5), ("Anatomy Involvement", 5),
+                     ("Duration of Illness", 5), ("Animal Contact Type", 8),
+                     ("Immune Status", 2)):
+            vals = ui.get(f, [])
+            if self._valid_user(vals):
+                max_sc += w
+                score += w * self._match_mask(f, clean(vals))
+
+        # Vector (8) with the explicit 'other' rule
+        vec = ui.get("Vector Exposure", [])
+        if self._valid_user(vec):
+            max_sc += 8
+            if vec == ["other(including unknown)"]:
+                score += 8
+            else:
+                score += 8 * self._match_mask("Vector Exposure", clean(vec))
+
+        # Symptoms (10) proportional to entries supplied
+        sy = ui.get("Symptoms", [])
+        if self._valid_user(sy):
+            max_sc += 10
+            entered = [x for x in sy if x.strip()]
+            counts = np.zeros(n)
+            for tok in entered:
+                counts += self._member_mask("Symptoms", tok)
+            score += (10 / max(1, len(entered))) * counts
+
+        # Blood Film (15): negative mismatch = -10; any positive pattern = +15
+        bf = ui.get("Blood Film Result", [])[:1] or [SENTINEL]
+        if self._valid_user(bf):
+            max_sc += 15
+            if bf[0] == "negative":
+                score -= 10 * ~self._has_negative["Blood Film Result"]
+            else:
+                score += 15 * self._has_positive["Blood Film Result"]
+
+        # LFT (5) with 'Variable' rule
+        lft = ui.get("Liver Function Tests", [])[:1] or [SENTINEL]
+        if self._valid_user(lft):
+            max_sc += 5
+            score += 5 * (self._has_variable["Liver Function Tests"]
+                          | self._member_mask("Liver Function Tests", lft[0]))
+
+        # Binary fields (5 each) with 'Variable' rule
+        for f in self.BINARY_FIELDS:
+            v = ui.get(f, [])[:1] or [SENTINEL]
+            if self._valid_user(v):
+                max_sc += 5
+                score += 5 * (self._has_variable[f] | self._member_mask(f, v[0]))
+
+        # Cysts on Imaging (10): negative mismatch = -5; any pattern = +10
+        c = ui.get("Cysts on Imaging", [])[:1] or [SENTINEL]
+        if self._valid_user(c):
+            max_sc += 10
+            if c[0] == "negative":
+                score -= 5 * ~self._has_negative["Cysts on Imaging"]
+            else:
+                score += 10 * self._has_positive["Cysts on Imaging"]
+
+        # Nothing filled in: every row scores 0 without touching the fields
+        if max_sc <= 0:
+            return np.zeros(n)
+        return score / max_sc * 100
+
+    # --------------- user confidence (public util) -----------------
+
+    def compute_user_confidence(self, ui: dict, row: pd.Series) -> float:
+        """
+        Compute percentage based ONLY on fields the user filled.
+        Mirrors scoring rules but normalises to the max of only entered fields.
+        """
+        ui = self.normalize_input(ui)
+
+        def gl(field):
+            # pull from result row if provided, else from the stored ref_row
+            return self._split(row.get(field, "") if field in row else row.get("ref_row", {}).get(field, ""))
+
+        def match(u_list, field):
+            ds = gl(field)
+            u = [x for x in u_list
+                 if x.strip() and x not in ("unknown", "choose…", "choose...", SENTINEL)]
+            return any(x in ds for x in u)
+
+        score = 0.0
+        max_sc = 0.0
+
+        # Countries (5)
+        if self._valid_user(ui.get("Countries Visited", [])):
+            max_sc += 5
+            if match(ui["Countries Visited"], "Countries Visited"):
+                score += 5
+
+        # Anatomy (5)
+        if self._valid_user(ui.get("Anatomy Involvement", [])):
+            max_sc += 5
+            if match(ui["Anatomy Involvement"], "Anatomy Involvement"):
+                score += 5
+
+        # Vector (8)
+        if self._valid_user(ui.get("Vector Exposure", [])):
+            max_sc += 8
+            if ui["Vector Exposure"] == ["other(including unknown)"]:
+                score += 8
+            elif match(ui["Vector Exposure"], "Vector Exposure"):
+                score += 8
+
+        # Symptoms (10)
+        if self._valid_user(ui.get("Symptoms", [])):
+            max_sc += 10
+            db = gl("Symptoms")
+            entered = [s for s in ui["Symptoms"] if s.strip()]
+            m = sum(1 for s in entered if s in db)
+            score += (10 / max(1, len(entered))) * m
+
+        # Duration (5)
+        if self._valid_user(ui.get("Duration of Illness", [])):
+            max_sc += 5
+            if match(ui["Duration of Illness"], "Duration of Illness"):
+                score += 5
+
+        # Animal (8)
+        if self._valid_user(ui.get("Animal Contact Type", [])):
+            max_sc += 8
+            if match(ui["Animal Contact Type"], "Animal Contact Type"):
+                score += 8
+
+        # Blood Film (15)
+        bf = ui.get("Blood Film Result", [])[:1] or [SENTINEL]
+        db_bf = gl("Blood Film Result")
+        if self._valid_user(bf):
+            max_sc += 15
+            if bf[0] == "negative":
+                if all(x != "negative" for x in db_bf):
+                    score -= 10
+            else:
+                if any(x != "negative" for x in db_bf):
+                    score += 15
+
+        # Immune (2)
+        if self._valid_user(ui.get("Immune Status", [])):
+            max_sc += 2
+            if match(ui["Immune Status"], "Immune Status"):
+                score += 2
+
+        # LFT (5)
+        lft = ui.get("Liver Function Tests", [])[:1] or [SENTINEL]
+        if self._valid_user(lft):
+            max_sc += 5
+            db_l = gl("Liver Function Tests")
+            if "variable" in db_l or lft[0] in db_l:
+                score += 5
+
+        # Binary (5 each)
+        for f in self.BINARY_FIELDS:
+            v = ui.get(f, [])[:1] or [SENTINEL]
+            if self._valid_user(v):
+                max_sc += 5
+                dbv = gl(f)
+                if "variable" in dbv or v[0] in dbv:
+                    score += 5
+
+        # Cysts on Imaging (10)
+        c = ui.get("Cysts on Imaging", [])[:1] or [SENTINEL]
+        db_c = gl("Cysts on Imaging")
+        if self._valid_user(c):
+            max_sc += 10
+            if c[0] == "negative":
+                if all(x != "negative" for x in db_c):
+                    score -= 5
+            else:
+                if any(x != "negative" for x in db_c):
+                    score += 10
+
+        return (score / max_sc) * 100 if max_sc > 0 else 0.0